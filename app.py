@@ -63,7 +63,7 @@ try:
     from utils.preprocessor import clean_text, clean_reddit_content
     # Use our simplified embedding model instead of BERTopic
     from models.bertopic_model_simple import analyze_topics_in_text, get_topic_top_words
-    from utils.topic_refiner import refine_topic_name # Assumes OPENAI_API_KEY is set in environment
+    from utils.topic_refiner import refine_topic_names # Assumes OPENAI_API_KEY is set in environment
     from models.bart_summarizer import load_summarizer_model, summarize_text
     logging.info("Successfully imported all TopicMind components.")
 except ImportError as e:
@@ -76,7 +76,7 @@ except ImportError as e:
 try:
     nltk.data.find('tokenizers/punkt')
     logging.info("NLTK punkt tokenizer already available.")
-except nltk.downloader.DownloadError:
+except LookupError:
     logging.info("NLTK 'punkt' tokenizer not found. Downloading...")
     nltk.download('punkt')
     logging.info("NLTK 'punkt' downloaded successfully.")
@@ -279,6 +279,16 @@ def analyze_text():
                     topic_count_info = f"Found {len(topic_sentences)} topics instead of the requested {num_topics}"
                     logging.info(topic_count_info)
                 
+                # Refine all topic names in one OpenAI request if we have a valid API key
+                refined_names = {}
+                if openai_api_key and openai_api_key != "your_openai_api_key_here":
+                    topic_ids = list(topic_sentences)
+                    try:
+                        names = refine_topic_names([topic_keywords.get(topic_id, []) for topic_id in topic_ids])
+                        refined_names = dict(zip(topic_ids, names))
+                    except Exception as e:
+                        logging.warning(f"Topic refinement failed: {e}, using fallback names")
+                
                 # Process each topic
                 for topic_id, sentences in topic_sentences.items():
                     # Get the keywords for this topic
@@ -286,15 +296,12 @@ def analyze_text():
                     
                     # Only use topic_refiner if we have a valid OpenAI API key
                     if openai_api_key and openai_api_key != "your_openai_api_key_here":
-                        try:
-                            # Try to refine the topic name using OpenAI
-                            refined_name = refine_topic_name(words)
-                            topic_name = refined_name
+                        if topic_id in refined_names:
+                            topic_name = refined_names[topic_id]
                             logging.info(f"Using OpenAI refined topic name: {topic_name}")
-                        except Exception as e:
+                        else:
                             # Fall back to simple format if refinement fails
                             topic_name = f"Topic: {', '.join(words[:3])}"
-                            logging.warning(f"Topic refinement failed: {e}, using fallback name")
                     else:
                         # No valid API key, use simple format
                         topic_name = f"Topic: {', '.join(words[:3])}"
@@ -588,15 +595,17 @@ def process_topics(text, num_topics=5):
         
         # Format results for API response
         results = []
+        
+        # Try to refine all topic names in one request if OpenAI API key is available
+        refined_names = {}
+        if openai_api_key and openai_api_key != "your_openai_api_key_here":
+            try:
+                refined_names = dict(zip(topic_keywords, refine_topic_names(list(topic_keywords.values()))))
+            except Exception:
+                pass
+        
         for topic_id, keywords in topic_keywords.items():
-            # Try to refine the topic name if OpenAI API key is available
-            if openai_api_key and openai_api_key != "your_openai_api_key_here":
-                try:
-                    topic_name = refine_topic_name(keywords)
-                except Exception:
-                    topic_name = f"Topic: {', '.join(keywords[:3])}"
-            else:
-                topic_name = f"Topic: {', '.join(keywords[:3])}"
+            topic_name = refined_names.get(topic_id, f"Topic: {', '.join(keywords[:3])}")
                 
             # Get sentences for this topic
             sentences = topic_sentences.get(topic_id, [])
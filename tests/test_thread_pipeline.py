@@ -92,6 +92,26 @@ def test_thread_refiner(text: str, keywords: List[str], max_sentences: int = 15)
         logger.error(f"Error in thread refiner: {e}")
         return []
 
+def test_sentence_splitter() -> None:
+    """Regression check for the fast regex sentence splitter used on short inputs"""
+    from utils.thread_refiner import _fast_split_sentences
+    
+    cases = {
+        # Abbreviations, initials and list numbers stay inside the sentence
+        "Dr. Smith went home. He was tired.": ["Dr. Smith went home.", "He was tired."],
+        "The U.S. Army said no. Then what?": ["The U.S. Army said no.", "Then what?"],
+        "J. R. Tolkien wrote it. Mrs. Brown read it.": ["J. R. Tolkien wrote it.", "Mrs. Brown read it."],
+        "Steps:\n1. Do this. Then rest.": ["Steps:\n1. Do this.", "Then rest."],
+        # Short capitalized words are real sentence ends
+        "Ok. I talked to HR and they said the policy changed.": ["Ok.", "I talked to HR and they said the policy changed."],
+        "No. You should see a doctor about that.": ["No.", "You should see a doctor about that."],
+        "Oh. So. Neither do I. But it helps.": ["Oh.", "So.", "Neither do I.", "But it helps."],
+        "I got an A. Then I celebrated.": ["I got an A.", "Then I celebrated."],
+    }
+    for text, expected in cases.items():
+        sentences = _fast_split_sentences(text)
+        assert sentences == expected, f"{text!r} split into {sentences!r}"
+
 def test_chunked_summarization(sentence_dicts: List[Dict[str, Any]], 
                               keywords: List[str],
                               topic_name: str = None,
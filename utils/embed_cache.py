@@ -0,0 +1,131 @@
+"""
+Persistent embedding cache for sentence transformer models.
+Embeddings are keyed by the model identity and the SHA-1 of the sentence text, so re-runs
+and incremental feeds only encode sentences that have not been seen before.
+"""
+
+import hashlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+# Optional persistent backend; fall back to an in-process cache when unavailable
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the on-disk cache
+EMBED_CACHE_DIR = "logs/embed_cache"
+
+# Size bound of the on-disk cache; least recently used entries are evicted beyond it
+EMBED_CACHE_SIZE_LIMIT = 256 * 1024 * 1024
+
+# Maximum number of embeddings kept by the in-memory fallback (oldest evicted first)
+MEMORY_CACHE_SIZE = 10000
+
+# Sentences per forward pass; larger batches keep the CPU matmuls busier than the default 32
+ENCODE_BATCH_SIZE = 64
+
+# Lazily opened cache (diskcache.Cache, or a dict when diskcache is not installed)
+_cache = None
+
+def get_cache():
+    """
+    Returns the shared embedding cache, opening it on first use.
+
+    Returns:
+        A mapping from cache key to float16 embedding
+    """
+    global _cache
+    if _cache is None:
+        if DISKCACHE_AVAILABLE:
+            try:
+                _cache = diskcache.Cache(EMBED_CACHE_DIR, size_limit=EMBED_CACHE_SIZE_LIMIT,
+                                         eviction_policy='least-recently-used')
+            except Exception as e:
+                logger.warning(f"Could not open embedding cache at {EMBED_CACHE_DIR}: {e}")
+                _cache = {}
+        else:
+            logger.info("diskcache not available. Embeddings will only be cached in memory.")
+            _cache = {}
+    return _cache
+
+def get_model_identity(model) -> Optional[str]:
+    """
+    Identifies a sentence transformer model by its name and embedding dimension, so cached
+    embeddings are never reused across different models.
+
+    Args:
+        model: Loaded sentence transformer model
+
+    Returns:
+        An identity string, or None if the model name cannot be determined
+    """
+    try:
+        name = model._first_module().auto_model.config.name_or_path
+        dimension = model.get_sentence_embedding_dimension()
+    except Exception:
+        return None
+    if not name or not dimension:
+        return None
+    return f"{name}:{dimension}"
+
+def _encode(texts: List[str], model) -> np.ndarray:
+    """Encodes texts into L2-normalized float16 embeddings."""
+    return model.encode(texts, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True,
+                        normalize_embeddings=True, show_progress_bar=False).astype(np.float16)
+
+def get_or_encode(texts: List[str], model) -> Optional[np.ndarray]:
+    """
+    Returns normalized embeddings for texts, encoding only those missing from the cache.
+
+    Args:
+        texts: List of sentences to embed
+        model: Loaded sentence transformer model
+
+    Returns:
+        float16 array of shape (len(texts), dim) with L2-normalized embeddings, or None for
+        empty input
+    """
+    if not texts:
+        return None
+
+    # Without a reliable model identity, caching could mix up embeddings between models
+    model_identity = get_model_identity(model)
+    if model_identity is None:
+        logger.info("Could not identify the embedding model. Encoding without the cache.")
+        return _encode(texts, model)
+
+    cache = get_cache()
+    prefix = model_identity.encode('utf-8') + b'\0'
+    keys = [hashlib.sha1(prefix + text.encode('utf-8')).digest() for text in texts]
+
+    # Look up each distinct key once, collecting the misses to encode
+    found = {}
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in misses:
+            embedding = cache.get(key)
+            if embedding is None:
+                misses[key] = text
+            else:
+                found[key] = embedding
+
+    if misses:
+        new_embeddings = _encode(list(misses.values()), model)
+        for key, embedding in zip(misses, new_embeddings):
+            cache[key] = embedding
+            found[key] = embedding
+        logger.info(f"Encoded {len(misses)} new sentences ({len(texts) - len(misses)} from cache)")
+
+        # Evict the oldest entries once the in-memory fallback is over capacity
+        if isinstance(cache, dict):
+            while len(cache) > MEMORY_CACHE_SIZE:
+                del cache[next(iter(cache))]
+
+    return np.stack([found[key] for key in keys])
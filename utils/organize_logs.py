@@ -5,6 +5,7 @@ Run this script to clean up and organize log files after testing.
 """
 
 import os
+import re
 import shutil
 import glob
 import datetime
@@ -14,6 +15,12 @@ from pathlib import Path
 # Main logs directory
 LOGS_ROOT = "logs"
 
+# Buffer size for index writes, large enough to hold a full index in one flush
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Timestamp embedded in log filenames, e.g. chunk_pass_log_20250515_084318.json
+_TS_RE = re.compile(r'_(20\d{2})(\d{2})(\d{2})(?!\d)')
+
 # Output organized structure
 ORGANIZED_LOGS = {
     "gpt": {
@@ -49,6 +56,11 @@ ORGANIZED_LOGS = {
     }
 }
 
+def make_parent_dirs(paths):
+    """Creates the parent directory of each path, visiting each unique directory once"""
+    for directory in sorted({os.path.dirname(path) for path in paths}):
+        os.makedirs(directory, exist_ok=True)
+
 def setup_log_folders():
     """Creates the organized log folder structure"""
     print("Setting up organized log folder structure...")
@@ -122,7 +134,8 @@ def organize_pipeline_logs():
         }
     ]
     
-    # Process each pattern
+    # Resolve the destination of every matching file up front
+    copy_pairs = []
     for pattern_info in log_patterns:
         pattern = pattern_info["pattern"]
         destination = pattern_info["destination"]
@@ -131,29 +144,27 @@ def organize_pipeline_logs():
         matching_files = glob.glob(pattern)
         print(f"Found {len(matching_files)} files matching {pattern}")
         
-        # Copy files to organized location
         for file_path in matching_files:
             filename = os.path.basename(file_path)
             dest_path = os.path.join(destination, filename)
             
-            # If the file has a timestamp, create a dated subfolder
-            if "_20" in filename:  # Look for timestamp pattern like _20250515
-                try:
-                    # Try to parse timestamp from filename
-                    timestamp_part = filename.split("_")[1][:8]  # e.g., 20250515
-                    if len(timestamp_part) == 8 and timestamp_part.isdigit():
-                        # Create YYYY-MM-DD format
-                        date_folder = f"{timestamp_part[:4]}-{timestamp_part[4:6]}-{timestamp_part[6:8]}"
-                        dated_destination = os.path.join(destination, date_folder)
-                        os.makedirs(dated_destination, exist_ok=True)
-                        dest_path = os.path.join(dated_destination, filename)
-                except (IndexError, ValueError):
-                    pass  # Use default destination if timestamp extraction fails
+            # If the file has a timestamp (e.g., _20250515), use a dated subfolder
+            match = _TS_RE.search(filename)
+            if match:
+                # Create YYYY-MM-DD format
+                date_folder = f"{match[1]}-{match[2]}-{match[3]}"
+                dest_path = os.path.join(destination, date_folder, filename)
             
-            # Copy the file
-            if os.path.exists(file_path) and not os.path.exists(dest_path):
-                shutil.copy2(file_path, dest_path)
-                print(f"  Copied: {file_path} → {dest_path}")
+            copy_pairs.append((file_path, dest_path))
+    
+    # Create each destination folder once rather than once per file
+    make_parent_dirs(dest for _, dest in copy_pairs)
+    
+    # Copy files to organized location
+    for file_path, dest_path in copy_pairs:
+        if os.path.exists(file_path) and not os.path.exists(dest_path):
+            shutil.copy2(file_path, dest_path)
+            print(f"  Copied: {file_path} → {dest_path}")
 
 def create_log_index():
     """Creates an index of all log files for easy browsing"""
@@ -203,35 +214,50 @@ def create_log_index():
     
     # Write index as JSON
     index_path = os.path.join(LOGS_ROOT, "log_index.json")
-    with open(index_path, "w") as f:
+    with open(index_path, "w", buffering=WRITE_BUFFER_SIZE) as f:
         json.dump(index_data, f, indent=2)
         
-    # Write a human-readable version
-    index_md_path = os.path.join(LOGS_ROOT, "log_index.md")
-    with open(index_md_path, "w") as f:
-        f.write("# TopicMind Log Index\n\n")
-        f.write(f"Last updated: {index_data['last_updated']}\n\n")
-        
-        for category, files in index_data["categories"].items():
-            if not files:
-                continue
-                
-            f.write(f"## {category.replace('/', ' › ')}\n\n")
-            
-            f.write("| File | Modified | Size |\n")
-            f.write("|------|----------|------|\n")
+    # Build the human-readable version in memory and write it in one call
+    parts = [
+        "# TopicMind Log Index\n\n",
+        f"Last updated: {index_data['last_updated']}\n\n"
+    ]
+    
+    for category, files in index_data["categories"].items():
+        if not files:
+            continue
             
-            for file_info in files:
-                # Format file size nicely
-                size_kb = file_info["size"] / 1024
-                size_str = f"{size_kb:.1f} KB" if size_kb < 1024 else f"{size_kb/1024:.1f} MB"
-                
-                f.write(f"| {file_info['name']} | {file_info['modified']} | {size_str} |\n")
+        parts.append(f"## {category.replace('/', ' › ')}\n\n")
+        parts.append("| File | Modified | Size |\n")
+        parts.append("|------|----------|------|\n")
+        
+        for file_info in files:
+            # Format file size nicely
+            size_kb = file_info["size"] / 1024
+            size_str = f"{size_kb:.1f} KB" if size_kb < 1024 else f"{size_kb/1024:.1f} MB"
             
-            f.write("\n")
+            parts.append(f"| {file_info['name']} | {file_info['modified']} | {size_str} |\n")
+        
+        parts.append("\n")
+    
+    index_md_path = os.path.join(LOGS_ROOT, "log_index.md")
+    with open(index_md_path, "w", buffering=WRITE_BUFFER_SIZE) as f:
+        f.write("".join(parts))
     
     print(f"Created log index at {index_path} and {index_md_path}")
 
+def iter_old_logs(root, cutoff_ts, skip_dir):
+    """Yields log files under root last modified before cutoff_ts, skipping skip_dir"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path != skip_dir:
+                    yield from iter_old_logs(entry.path, cutoff_ts, skip_dir)
+            elif (entry.name.endswith(('.log', '.json', '.txt'))
+                  and not entry.name.startswith('.')
+                  and entry.stat().st_mtime < cutoff_ts):
+                yield entry.path
+
 def archive_old_logs(days_old=30):
     """Archives logs older than the specified number of days"""
     print(f"Archiving logs older than {days_old} days...")
@@ -245,34 +271,24 @@ def archive_old_logs(days_old=30):
     archive_dir = os.path.join(LOGS_ROOT, "archived", "dated_archives", f"archive_{archive_date}")
     os.makedirs(archive_dir, exist_ok=True)
     
-    # Find all log files
-    all_logs = []
-    for root, _, files in os.walk(LOGS_ROOT):
-        for file in files:
-            if file.endswith(('.log', '.json', '.txt')) and not file.startswith('.'):
-                file_path = os.path.join(root, file)
-                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                if mtime < cutoff:
-                    all_logs.append((file_path, mtime))
-    
-    # Archive old logs
+    # Stream old logs and move each one as it is found
+    archive_root = os.path.join(LOGS_ROOT, "archived")
+    created_dirs = set()
     archived_count = 0
-    for file_path, mtime in all_logs:
-        # Don't archive files that are already in an archive
-        if "archived" in file_path:
-            continue
-            
+    for file_path in iter_old_logs(LOGS_ROOT, cutoff.timestamp(), archive_root):
         # Get relative path to maintain folder structure in archive
         rel_path = os.path.relpath(file_path, LOGS_ROOT)
         archive_path = os.path.join(archive_dir, rel_path)
         
-        # Create directory structure in archive
-        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        # Create directory structure in archive, once per unique folder
+        archive_parent = os.path.dirname(archive_path)
+        if archive_parent not in created_dirs:
+            os.makedirs(archive_parent, exist_ok=True)
+            created_dirs.add(archive_parent)
         
         # Move file to archive
-        if os.path.exists(file_path):
-            shutil.move(file_path, archive_path)
-            archived_count += 1
+        shutil.move(file_path, archive_path)
+        archived_count += 1
     
     print(f"Archived {archived_count} old log files to {archive_dir}")
     
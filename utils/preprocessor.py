@@ -1,30 +1,181 @@
+import os
 import re
 import string
-import nltk
+import pickle
+import asyncio
 import logging
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+import functools
+import multiprocessing
+from typing import List, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Download nltk data if not present
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError as e:
-    logging.info(f"NLTK data not found: {e}. Downloading...")
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    logging.info("NLTK data downloaded successfully.")
-
-# Load stopwords once
+# Stopwords are cached here after the first NLTK load, so later processes (and forked
+# workers) skip the NLTK data lookup and corpus parsing entirely
+STOPWORDS_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'topic-mind', 'stopwords.pkl')
+
+
+def _load_stopwords() -> frozenset:
+    """
+    Loads the English stopword set from the pickle cache, falling back to NLTK
+    (downloading the corpus if needed) and writing the cache for next time.
+    """
+    try:
+        with open(STOPWORDS_CACHE_PATH, 'rb') as f:
+            return frozenset(pickle.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # Corrupt or incompatible cache (unpickling can raise almost anything); rebuild it below
+        logging.warning(f"Could not read stopword cache at {STOPWORDS_CACHE_PATH}: {e}")
+    
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        words = frozenset(stopwords.words('english'))
+    except LookupError as e:
+        logging.info(f"NLTK data not found: {e}. Downloading...")
+        nltk.download('stopwords')
+        logging.info("NLTK data downloaded successfully.")
+        words = frozenset(stopwords.words('english'))
+    
+    try:
+        os.makedirs(os.path.dirname(STOPWORDS_CACHE_PATH), exist_ok=True)
+        with open(STOPWORDS_CACHE_PATH, 'wb') as f:
+            pickle.dump(words, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        logging.warning(f"Could not write stopword cache to {STOPWORDS_CACHE_PATH}: {e}")
+    
+    return words
+
+
+# Maximum number of distinct inputs memoized by clean_reddit_content and clean_text;
+# Reddit pipelines re-clean the same posts and comments across refresh cycles
+CLEAN_CACHE_SIZE = 8192
+
+# Only inputs up to this many characters are memoized, so the cache holds short posts and
+# comments rather than whole concatenated documents
+CLEAN_CACHE_MAX_CHARS = 2048
+
+# Load stopwords once at import; frozenset keeps membership checks fast in the filter loop
+_STOPWORDS = _load_stopwords()
+
+# Use Google's RE2 engine (pip install google-re2) for the heavier patterns when it is
+# installed: it matches in linear time, so adversarial input cannot trigger catastrophic
+# backtracking. Falls back to the standard library engine otherwise.
 try:
-    stop_words = set(stopwords.words('english'))
-except LookupError:
-    logging.error("NLTK stopwords not found. Trying to download...")
-    nltk.download('stopwords')
-    stop_words = set(stopwords.words('english'))
+    import re2
+    logging.info("RE2 available for text preprocessing.")
+except ImportError:
+    re2 = None
+
+
+def _compile(pattern: str):
+    """
+    Compiles a pattern with RE2 when available, otherwise (or when the pattern uses
+    syntax RE2 does not support, such as lookarounds) with the standard re module.
+    Flags must be given inline, e.g. (?m), so the pattern works with either engine.
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+
+# Alphabetic word tokens (any script, like str.isalpha), used in place of NLTK's
+# word_tokenize for stopword filtering
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Reddit UI elements removed by clean_reddit_content, combined into one alternation so
+# the text is scanned once. Alternatives are tried left to right at each position, so
+# longer phrases come before the shorter patterns they contain (e.g. "Posted 3d ago"
+# before "3d ago", "Comments Section" before "Comment 12").
+_REDDIT_UI_PATTERNS = [
+    # Usernames, rewritten to a standardized format rather than removed
+    r'(?P<user_avatar>u/(?P<avatar_name>[a-zA-Z0-9_-]+) avatar)',
+    r'(?P<user>u/(?P<user_name>[a-zA-Z0-9_-]+))',
+    # Time indicators (both with and without bullets/dots)
+    r'Posted\s+\d+[ymwdh]\s*ago',
+    r'Edited\s+\d+[ymwdh]\s*ago',
+    # Voting/comment buttons directly followed by a time, before the voting patterns below
+    # can swallow the leading digit of the time
+    r'(?:Upvote|Downvote|Comment)\s*\d+[ymwdh]\s*ago',
+    r'[•·]?\s*\d+[ymwdh]\s*ago',
+    # Media player time indicators
+    r'\d+:\d+\s*/\s*\d+:\d+',
+    # UI indicators and interaction elements
+    r'(?i:\b(?:reply|share|report|save|award|follow)\b)',
+    r'\bVideo\b|\bArchived post\.|New comments cannot be posted and votes cannot be cast\.',
+    # Navigation elements
+    r'Go to comments',
+    r'Sort by:.*?\n',
+    r'Search Comments|Expand comment search',
+    r'Comments Section',
+    r'Join the conversation',
+    r'View all comments',
+    r'Continue this thread',
+    r'Collapse thread',
+    # Voting UI elements
+    r'Upvote\s*[\dKMk\.]*',
+    r'Downvote\s*[\dKMk\.]*',
+    r'Comment\s*[\dKMk\.]*',
+    r'Award|Share',
+    # Point counts and indicators
+    r'\b\d+\s*points?\b',
+    r'(?i:\b\d+\s*k\s*points?\b)',
+    # Reply navigation (e.g., "15 more replies")
+    r'\d+\s*(?:more)?\s*replies',
+    r'(?i:see all replies)',
+]
+_RE_REDDIT_UI = _compile('|'.join(_REDDIT_UI_PATTERNS))
+
+# Cleanup patterns applied after the UI elements are gone
+_RE_LONE_DOT = re.compile(r'(?<!\w)\.(?!\w)')
+_RE_STANDALONE_NUMBER = re.compile(r'^\s*\d+\s*$', re.MULTILINE)
+_RE_MULTI_NEWLINE = re.compile(r'\n{3,}')
+_RE_MULTI_SPACE = re.compile(r' {2,}')
+# A line whose last non-space character is not sentence-ending punctuation; the line is
+# captured without its surrounding whitespace so it can be rewritten as "<line>."
+_RE_ADD_PERIOD = re.compile(r'(?m)^[^\S\n]*(.*[^\s.!?:;])[^\S\n]*$')
+_RE_BLANK_LINES = re.compile(r'(?m)^\s*\n')
+
+# Pre-compiled patterns for clean_text
+_RE_URL = _compile(r'http\S+|www\S+|https\S+')
+# Emojis (basic range, might need refinement)
+# Reference: https://stackoverflow.com/questions/33404752/removing-emojis-from-a-string-in-python
+_RE_EMOJI = re.compile(
+    "["
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    u"\U00002702-\U000027B0"
+    u"\U000024C2-\U0001F251"
+    "]+", flags=re.UNICODE)
+_RE_MD_BOLD = _compile(r'\*\*([^*]+)\*\*')
+_RE_MD_ITALIC_STAR = _compile(r'\*([^*]+)\*')
+_RE_MD_ITALIC_UNDERSCORE = _compile(r'_([^_]+)_')
+_RE_MD_CODE = _compile(r'`([^`]+)`')
+_RE_MD_LINK = _compile(r'\[([^\]]+)\]\([^)]*\)')
+_RE_MD_BLOCKQUOTE = _compile(r'(?m)^>.*$')
+_RE_MD_LIST_ITEM = _compile(r'(?m)^[\*\-+] ')
+# Maps every character that \s matches (i.e. str.isspace()) to a plain space, so runs of
+# mixed whitespace reduce to runs of spaces that a single ' {2,}' pass can collapse
+_WHITESPACE_TO_SPACE = str.maketrans(dict.fromkeys(
+    '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
+    '\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000', ' '))
+
+
+def _replace_reddit_ui(match) -> str:
+    """Replacement for _RE_REDDIT_UI: keeps usernames as context, drops everything else."""
+    if match.group('avatar_name'):
+        return f"@{match.group('avatar_name')}:"
+    if match.group('user_name'):
+        return f"@{match.group('user_name')}"
+    return ''
 
 
 def clean_reddit_content(text: str) -> str:
@@ -50,78 +201,39 @@ def clean_reddit_content(text: str) -> str:
     if not isinstance(text, str):
         return ""
     
-    # Replace usernames with standardized format first (before other removals)
-    # This preserves the username as context but in a cleaner format
-    text = re.sub(r'u/([a-zA-Z0-9_-]+) avatar', r'@\1:', text)
-    text = re.sub(r'u/([a-zA-Z0-9_-]+)', r'@\1', text)
-    
-    # Remove time indicators (both with and without bullets/dots)
-    text = re.sub(r'[•·]?\s*\d+[ymwdh]\s*ago', '', text)
-    text = re.sub(r'\b\d+[ymwdh]\s*ago\b', '', text)  # Match standalone time indicators
-    text = re.sub(r'Posted\s+\d+[ymwdh]\s*ago', '', text)
-    text = re.sub(r'Edited\s+\d+[ymwdh]\s*ago', '', text)
-    
-    # Remove media player time indicators
-    text = re.sub(r'\d+:\d+\s*/\s*\d+:\d+', '', text)
-    
-    # Remove UI indicators and interaction elements
-    text = re.sub(r'\breply\b', '', text, flags=re.IGNORECASE)  # Remove "reply" buttons
-    text = re.sub(r'\bshare\b', '', text, flags=re.IGNORECASE)  # Remove "share" buttons
-    text = re.sub(r'\breport\b', '', text, flags=re.IGNORECASE)  # Remove "report" buttons
-    text = re.sub(r'\bsave\b', '', text, flags=re.IGNORECASE)  # Remove "save" buttons
-    text = re.sub(r'\baward\b', '', text, flags=re.IGNORECASE)  # Remove "award" text
-    text = re.sub(r'\bfollow\b', '', text, flags=re.IGNORECASE)  # Remove "follow" buttons
-    text = re.sub(r'\bVideo\b|\bArchived post\.|New comments cannot be posted and votes cannot be cast\.', '', text)
-    
-    # Remove navigation elements
-    text = re.sub(r'Go to comments', '', text)
-    text = re.sub(r'Sort by:.*?\n', '', text)
-    text = re.sub(r'Search Comments|Expand comment search', '', text)
-    text = re.sub(r'Comments Section', '', text)
-    text = re.sub(r'Join the conversation', '', text)
-    text = re.sub(r'View all comments', '', text)
-    text = re.sub(r'Continue this thread', '', text)
-    text = re.sub(r'Collapse thread', '', text)
-    
-    # Remove voting UI elements
-    text = re.sub(r'Upvote\s*[\dKMk\.]*', '', text)
-    text = re.sub(r'Downvote\s*[\dKMk\.]*', '', text)
-    text = re.sub(r'Comment\s*[\dKMk\.]*', '', text)
-    text = re.sub(r'Award|Share', '', text)
-    
-    # Remove point counts and indicators
-    text = re.sub(r'\b\d+\s*points?\b', '', text)
-    text = re.sub(r'\b\d+\s*k\s*points?\b', '', text, flags=re.IGNORECASE)
-    
-    # Remove reply navigation (e.g., "15 more replies")
-    text = re.sub(r'\d+\s*(more)?\s*replies', '', text)
-    text = re.sub(r'see all replies', '', text, flags=re.IGNORECASE)
+    if len(text) <= CLEAN_CACHE_MAX_CHARS:
+        return _clean_reddit_content_cached(text)
+    return _clean_reddit_content(text)
+
+
+def _clean_reddit_content(text: str) -> str:
+    """Cleaning steps of clean_reddit_content."""
+    # Remove UI elements and standardize usernames in a single pass
+    text = _RE_REDDIT_UI.sub(_replace_reddit_ui, text)
     
     # Remove single dots that might be UI separators
-    text = re.sub(r'(?<!\w)\.(?!\w)', ' ', text)
+    text = _RE_LONE_DOT.sub(' ', text)
     
     # Clean specific patterns in the example
-    text = re.sub(r'^\s*\d+\s*$', '', text, flags=re.MULTILINE)  # Standalone numbers (like vote counts)
+    text = _RE_STANDALONE_NUMBER.sub('', text)  # Standalone numbers (like vote counts)
     
     # Clean double newlines and spaces
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Keep some paragraph structure
-    text = re.sub(r' {2,}', ' ', text)
+    text = _RE_MULTI_NEWLINE.sub('\n\n', text)  # Keep some paragraph structure
+    text = _RE_MULTI_SPACE.sub(' ', text)
     
     # Add periods to lines that might be sentence fragments without proper ending
-    lines = text.split('\n')
-    for i in range(len(lines)):
-        line = lines[i].strip()
-        if line and not line.endswith(('.', '!', '?', ':', ';')):
-            lines[i] = line + '.'
-    
-    text = '\n'.join(lines)
+    text = _RE_ADD_PERIOD.sub(r'\1.', text)
     
     # Final cleanup - remove any empty lines or spaces at beginning/end
-    text = '\n'.join(line for line in text.split('\n') if line.strip())
+    text = _RE_BLANK_LINES.sub('', text)
     
     return text.strip()
 
 
+# Memoized on the input text (short inputs only, see CLEAN_CACHE_MAX_CHARS)
+_clean_reddit_content_cached = functools.lru_cache(maxsize=CLEAN_CACHE_SIZE)(_clean_reddit_content)
+
+
 def clean_text(text: str, remove_stopwords_flag: bool = False) -> str:
     """
     Cleans the input text by removing URLs, emojis, markdown-like syntax,
@@ -138,31 +250,28 @@ def clean_text(text: str, remove_stopwords_flag: bool = False) -> str:
         logging.warning(f"Expected string input, got {type(text)}. Returning empty string.")
         return ""
 
+    if len(text) <= CLEAN_CACHE_MAX_CHARS:
+        return _clean_text_cached(text, remove_stopwords_flag)
+    return _clean_text(text, remove_stopwords_flag)
+
+
+def _clean_text(text: str, remove_stopwords_flag: bool) -> str:
+    """Cleaning steps of clean_text."""
     # 1. Remove URLs
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-
-    # 2. Remove Emojis (basic range, might need refinement)
-    # Reference: https://stackoverflow.com/questions/33404752/removing-emojis-from-a-string-in-python
-    emoji_pattern = re.compile(
-        "["
-        u"\U0001F600-\U0001F64F"  # emoticons
-        u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-        u"\U0001F680-\U0001F6FF"  # transport & map symbols
-        u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        u"\U00002702-\U000027B0"
-        u"\U000024C2-\U0001F251"
-        "]+", flags=re.UNICODE)
-    text = emoji_pattern.sub(r'', text)
+    text = _RE_URL.sub('', text)
+
+    # 2. Remove Emojis
+    text = _RE_EMOJI.sub(r'', text)
 
     # 3. Remove Markdown (simple cases: *, _, `, [](), etc.)
     # Basic markdown removal (links handled by URL removal)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Bold **text**
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)      # Italic *text*
-    text = re.sub(r'_([^_]+)_', r'\1', text)         # Italic _text_
-    text = re.sub(r'`([^`]+)`', r'\1', text)         # Code `text`
-    text = re.sub(r'\[([^\]]+)\]\([^)]*\)', r'\1', text) # Links [text](url) -> text
-    text = re.sub(r'^>.*$', '', text, flags=re.MULTILINE) # Blockquotes > text
-    text = re.sub(r'^[\*\-+] ', '', text, flags=re.MULTILINE) # List items * - +
+    text = _RE_MD_BOLD.sub(r'\1', text)                # Bold **text**
+    text = _RE_MD_ITALIC_STAR.sub(r'\1', text)         # Italic *text*
+    text = _RE_MD_ITALIC_UNDERSCORE.sub(r'\1', text)   # Italic _text_
+    text = _RE_MD_CODE.sub(r'\1', text)                # Code `text`
+    text = _RE_MD_LINK.sub(r'\1', text)                # Links [text](url) -> text
+    text = _RE_MD_BLOCKQUOTE.sub('', text)             # Blockquotes > text
+    text = _RE_MD_LIST_ITEM.sub('', text)              # List items * - +
 
     # 4. Normalize case to lowercase
     text = text.lower()
@@ -171,31 +280,65 @@ def clean_text(text: str, remove_stopwords_flag: bool = False) -> str:
     # text = text.translate(str.maketrans('', '', string.punctuation))
     # Consider keeping sentence-ending punctuation if tokenizing later.
 
-    # 6. Remove extra whitespace and empty lines
-    text = re.sub(r'\s+', ' ', text).strip()
-    text = re.sub(r'\n+', '\n', text).strip() # Keep single newlines if paragraphs matter
+    # 6. Remove extra whitespace and empty lines (newlines included)
+    text = _RE_MULTI_SPACE.sub(' ', text.translate(_WHITESPACE_TO_SPACE)).strip()
 
     # 7. Remove stopwords if requested
     if remove_stopwords_flag:
-        try:
-            tokens = word_tokenize(text)
-            filtered_tokens = [word for word in tokens if word not in stop_words and word.isalpha()]
-            text = ' '.join(filtered_tokens)
-        except LookupError as e:
-            logging.error(f"NLTK data error: {e}")
-            logging.info("Trying to download required NLTK data...")
-            nltk.download('punkt')
-            tokens = word_tokenize(text)
-            filtered_tokens = [word for word in tokens if word not in stop_words and word.isalpha()]
-            text = ' '.join(filtered_tokens)
-        except Exception as e:
-            logging.error(f"Error during stopword removal: {e}")
-            # Keep the original text if stopword removal fails
+        # Runs of letters are the alphabetic tokens the isalpha() filter used to keep
+        tokens = _WORD_RE.findall(text)
+        filtered_tokens = [word for word in tokens if word not in _STOPWORDS]
+        text = ' '.join(filtered_tokens)
 
     # TODO: Consider lemmatization or stemming for better topic modeling if needed in the future
 
     return text
 
+
+# Memoized on the input text and flag (short inputs only, see CLEAN_CACHE_MAX_CHARS)
+_clean_text_cached = functools.lru_cache(maxsize=CLEAN_CACHE_SIZE)(_clean_text)
+
+
+# Number of texts handed to a worker at a time by clean_texts
+BATCH_CHUNK_SIZE = 64
+
+
+def _warm_compiled_regexes() -> None:
+    """Pool initializer: runs a tiny input through the cleaner so each worker is warm."""
+    clean_reddit_content("u/warmup avatar\nReply")
+
+
+def clean_texts(texts: List[str], workers: Optional[int] = None) -> List[str]:
+    """
+    Cleans a batch of Reddit posts/comments with clean_reddit_content, spreading the
+    work across processes since each text is independent and regex-bound.
+    
+    Args:
+        texts: Raw Reddit post/comment contents
+        workers: Number of worker processes (default: os.cpu_count())
+        
+    Returns:
+        Cleaned contents, in the same order as the input
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    # Not worth starting a pool for a single worker or a single chunk of work
+    if workers <= 1 or len(texts) <= BATCH_CHUNK_SIZE:
+        return [clean_reddit_content(text) for text in texts]
+    
+    with multiprocessing.Pool(workers, initializer=_warm_compiled_regexes) as pool:
+        return list(pool.imap(clean_reddit_content, texts, chunksize=BATCH_CHUNK_SIZE))
+
+
+async def clean_texts_async(texts: List[str], workers: Optional[int] = None) -> List[str]:
+    """
+    Awaitable version of clean_texts for asyncio callers; the batch runs in the default
+    executor so the event loop is not blocked.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, clean_texts, texts, workers)
+
 # For testing purposes
 if __name__ == "__main__":
     sample_text = """
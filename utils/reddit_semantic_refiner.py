@@ -1,13 +1,17 @@
 import os
 import re
 import logging
+import threading
+import contextlib
 import numpy as np
-from typing import List, Set, Dict, Tuple, Optional
-import nltk
-from nltk.tokenize import sent_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Set, Dict, Tuple, Optional, TYPE_CHECKING
+from utils.semantic_common import (NON_INFORMATIVE_REPLIES, SYMPATHY_ONLY_PHRASES, configure_torch_threads,
+                                   is_non_informative, is_sympathy_only, term_relevance_scores)
+
+# sentence_transformers (torch), sklearn and nltk are imported inside the functions that
+# use them, so importing this module (e.g. just for the sentence filters) stays cheap
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,86 +23,129 @@ os.makedirs("logs", exist_ok=True)
 # Set up model constants
 MODEL_NAME = "all-mpnet-base-v2"  # As specified in the task
 
-# Lists for filtering
-NON_INFORMATIVE_REPLIES = [
-    "lol", "same", "this", "haha", "yeah", "yep", "ok", "okay", "thx", "thanks", 
-    "ty", "cool", "nice", "wow", "omg", "lmao", "rofl", "true", "false", "agree",
-    "disagree", "upvoted", "downvoted", "saved", "true that", "exactly", "facts",
-    "100%", "absolutely", "definitely", "for sure", "right"
-]
+# Optional directory holding an int8 ONNX export of the model (see OnnxSentenceEncoder)
+EMBEDDING_ONNX_DIR = os.environ.get('EMBEDDING_ONNX_DIR')
 
-SYMPATHY_ONLY_PHRASES = [
-    "sorry to hear", "my condolences", "rip", "rest in peace", "thoughts and prayers",
-    "sending love", "hugs", "that's terrible", "that's awful", "how sad",
-    "so sad", "feel better", "get well soon", "thinking of you", "praying for you",
-    "sorry for your loss", "sorry about that", "that sucks", "that's rough"
-]
+# Up to this many sentences, deduplication uses token overlap instead of embeddings
+TOKEN_OVERLAP_MAX_SENTENCES = 3
 
-# Singleton model instance
+# Singleton model instance, guarded so concurrent callers load it only once
 _model = None
+_model_lock = threading.Lock()
+
+# Embedding cache keyed by sentence text; boilerplate sentences recur across posts
+EMB_CACHE_SIZE = 10000
+_EMB_CACHE: Dict[str, np.ndarray] = {}
+_emb_cache_lock = threading.Lock()
 
-def load_embedding_model() -> Optional[SentenceTransformer]:
+class OnnxSentenceEncoder:
     """
-    Loads the sentence transformer model for embeddings.
+    Minimal stand-in for SentenceTransformer that runs a quantized ONNX export of the
+    embedding model through ONNX Runtime (int8 weights, VNNI kernels on recent CPUs).
+    
+    Export and quantize the model once with optimum:
+        optimum-cli export onnx --model sentence-transformers/all-mpnet-base-v2 \\
+            --task feature-extraction --optimize O3 mpnet_onnx/
+        optimum-cli onnxruntime quantize --avx512_vnni --onnx_model mpnet_onnx/ -o mpnet_int8/
+    then point EMBEDDING_ONNX_DIR at the output directory.
+    """
+    
+    def __init__(self, model_dir: str, max_seq_length: int = 384):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+    
+    def encode(self, sentences: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """Encodes sentences into mean-pooled embeddings, mirroring SentenceTransformer.encode."""
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors='np')
+            token_embeddings = self.model(**inputs).last_hidden_state
+            
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            batches.append((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        embeddings = np.concatenate(batches).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+def load_embedding_model() -> Optional["SentenceTransformer"]:
+    """
+    Loads the sentence transformer model for embeddings. Uses the quantized ONNX export
+    from EMBEDDING_ONNX_DIR when configured, falling back to the PyTorch model.
+    Thread-safe: concurrent callers share a single loaded model.
     
     Returns:
-        The loaded SentenceTransformer model, or None if loading fails
+        The loaded SentenceTransformer model (or ONNX equivalent), or None if loading fails
     """
     global _model
     if _model is not None:
         return _model
     
+    with _model_lock:
+        if _model is None:
+            _model = _load_embedding_model()
+    return _model
+
+def _load_embedding_model() -> Optional["SentenceTransformer"]:
+    """Loads a new embedding model instance (see load_embedding_model)."""
+    if EMBEDDING_ONNX_DIR:
+        try:
+            logging.info(f"Loading quantized ONNX embedding model from {EMBEDDING_ONNX_DIR}")
+            model = OnnxSentenceEncoder(EMBEDDING_ONNX_DIR)
+            logging.info("ONNX embedding model loaded successfully")
+            return model
+        except Exception as e:
+            logging.warning(f"Could not load ONNX embedding model, falling back to PyTorch: {e}")
+    
     try:
+        from sentence_transformers import SentenceTransformer
+        
         logging.info(f"Loading sentence transformer model ({MODEL_NAME}) in CPU-only mode")
-        _model = SentenceTransformer(MODEL_NAME, device='cpu')
+        model = SentenceTransformer(MODEL_NAME, device='cpu')
+        model.eval()
+        configure_torch_threads()
         logging.info(f"Sentence transformer model loaded successfully")
-        return _model
+        return model
     except Exception as e:
         logging.error(f"Error loading sentence transformer model: {e}")
         return None
 
-def is_non_informative(sentence: str) -> bool:
-    """
-    Checks if a sentence is a short, non-informative reply
-    
-    Args:
-        sentence: The input sentence
-        
-    Returns:
-        True if the sentence is non-informative, False otherwise
-    """
-    clean_text = sentence.strip().lower()
+def inference_context(model):
+    """Returns torch.inference_mode() for torch models, or a no-op context for ONNX."""
+    if isinstance(model, OnnxSentenceEncoder):
+        return contextlib.nullcontext()
     
-    # Check for very short sentences (less than 4 words and 15 chars)
-    if len(clean_text.split()) < 4 and len(clean_text) < 15:
-        return True
-        
-    # Check if sentence consists solely of a non-informative phrase
-    for phrase in NON_INFORMATIVE_REPLIES:
-        if clean_text == phrase or clean_text.startswith(phrase + " ") or clean_text.endswith(" " + phrase):
-            return True
-    
-    return False
+    import torch
+    return torch.inference_mode()
 
-def is_sympathy_only(sentence: str) -> bool:
+def deduplicate_by_token_overlap(sentences: List[str], threshold: float = 0.85) -> List[str]:
     """
-    Checks if a sentence is only expressing sympathy without substantive content
+    Removes near-duplicate sentences based on Jaccard overlap of their lowercase tokens
     
     Args:
-        sentence: The input sentence
+        sentences: List of sentences to deduplicate
+        threshold: Overlap threshold for deduplication (default: 0.85)
         
     Returns:
-        True if the sentence only expresses sympathy, False otherwise
+        Deduplicated list of sentences
     """
-    clean_text = sentence.strip().lower()
+    token_sets = [set(sentence.lower().split()) for sentence in sentences]
     
-    # Short sentences that contain sympathy phrases are likely sympathy-only
-    if len(clean_text.split()) < 10:
-        for phrase in SYMPATHY_ONLY_PHRASES:
-            if phrase in clean_text:
-                return True
+    indices_to_keep = []
+    for i, tokens in enumerate(token_sets):
+        if not any(len(tokens & token_sets[j]) / max(len(tokens | token_sets[j]), 1) > threshold
+                   for j in indices_to_keep):
+            indices_to_keep.append(i)
     
-    return False
+    return [sentences[i] for i in indices_to_keep]
 
 def deduplicate_sentences(sentences: List[str], threshold: float = 0.85) -> List[str]:
     """
@@ -113,6 +160,12 @@ def deduplicate_sentences(sentences: List[str], threshold: float = 0.85) -> List
     """
     if not sentences:
         return []
+    if len(sentences) == 1:
+        return list(sentences)
+    
+    # A handful of sentences can be compared by token overlap without loading the model
+    if len(sentences) <= TOKEN_OVERLAP_MAX_SENTENCES:
+        return deduplicate_by_token_overlap(sentences, threshold)
         
     # Load embedding model
     model = load_embedding_model()
@@ -120,19 +173,39 @@ def deduplicate_sentences(sentences: List[str], threshold: float = 0.85) -> List
         logger.error("Embedding model failed to load. Skipping deduplication.")
         return sentences
     
-    # Get embeddings for all sentences
+    # Get embeddings for all sentences, encoding only those not already cached
     try:
-        embeddings = model.encode(sentences, convert_to_tensor=True)
-        embeddings = embeddings.cpu().numpy()  # Convert to numpy for similarity calculation
-        
-        # Calculate pairwise similarity
-        similarity_matrix = cosine_similarity(embeddings)
+        # Copy the hits locally so concurrent evictions cannot remove them before stacking
+        found = {}
+        misses = []
+        with _emb_cache_lock:
+            for s in dict.fromkeys(sentences):
+                embedding = _EMB_CACHE.get(s)
+                if embedding is None:
+                    misses.append(s)
+                else:
+                    found[s] = embedding
+        if misses:
+            with inference_context(model):
+                new_embeddings = model.encode(misses, batch_size=64, normalize_embeddings=True,
+                                              convert_to_numpy=True, show_progress_bar=False)
+            found.update(zip(misses, new_embeddings))
+            with _emb_cache_lock:
+                _EMB_CACHE.update(zip(misses, new_embeddings))
+                # Evict the oldest entries once the cache is over capacity
+                while len(_EMB_CACHE) > EMB_CACHE_SIZE:
+                    del _EMB_CACHE[next(iter(_EMB_CACHE))]
+        embeddings = np.stack([found[s] for s in sentences])
         
-        # Track indices to keep
+        # Greedily keep each sentence that is not similar to any previously kept one.
+        # Embeddings are L2-normalized, so a dot product is the cosine similarity, and
+        # comparing against the kept rows avoids building the full N x N matrix.
+        kept_embeddings = np.empty_like(embeddings)
         indices_to_keep = []
-        for i in range(len(sentences)):
-            # If this sentence is not similar to any previously kept sentence, keep it
-            if not any(similarity_matrix[i, j] > threshold for j in indices_to_keep):
+        for i, embedding in enumerate(embeddings):
+            kept_count = len(indices_to_keep)
+            if kept_count == 0 or (kept_embeddings[:kept_count] @ embedding).max() <= threshold:
+                kept_embeddings[kept_count] = embedding
                 indices_to_keep.append(i)
                 
         # Return deduplicated sentences
@@ -145,7 +218,7 @@ def deduplicate_sentences(sentences: List[str], threshold: float = 0.85) -> List
 
 def rank_by_relevance(sentences: List[str], topic_keywords: List[str], max_sentences: int = 15) -> List[str]:
     """
-    Ranks sentences by relevance to topic keywords using TF-IDF
+    Ranks sentences by relevance to topic keywords using hashed term frequencies
     
     Args:
         sentences: List of sentences to rank
@@ -155,53 +228,28 @@ def rank_by_relevance(sentences: List[str], topic_keywords: List[str], max_sente
     Returns:
         List of sentences ranked by relevance, limited to max_sentences
     """
-    if not sentences or not topic_keywords:
+    # Nothing to rank without keywords or with a single sentence
+    if not sentences or not topic_keywords or len(sentences) == 1:
         return sentences[:max_sentences] if sentences else []
     
     try:
-        # Create a TF-IDF vectorizer
-        tfidf = TfidfVectorizer(stop_words='english')
-        
-        # Fit TF-IDF on all sentences
-        tfidf_matrix = tfidf.fit_transform(sentences)
+        # Hashed term-frequency score, weighted towards keyword-related terms
+        keywords_lower = [keyword.lower() for keyword in topic_keywords]
+        scores = term_relevance_scores(sentences, keywords_lower)
         
-        # Create a keyword importance vector
-        keywords_str = " ".join(topic_keywords)
-        keywords_tfidf = tfidf.transform([keywords_str])
+        # Boost score for sentences containing exact keywords
+        sentences_lower = [sentence.lower() for sentence in sentences]
+        keyword_hits = np.array([[keyword in sentence for keyword in keywords_lower]
+                                 for sentence in sentences_lower])
+        scores = scores + 3 * keyword_hits.sum(axis=1)
         
-        # Get feature names
-        feature_names = tfidf.get_feature_names_out()
-        
-        # Calculate sentence scores based on keywords
-        sentence_scores = []
-        
-        for i, sentence in enumerate(sentences):
-            # Get sentence vector
-            sentence_vector = tfidf_matrix[i].toarray().flatten()
-            
-            # Calculate weighted score based on keyword importance
-            score = 0
-            
-            # Boost score for sentences containing exact keywords
-            for keyword in topic_keywords:
-                if keyword.lower() in sentence.lower():
-                    score += 3
-            
-            # Add TF-IDF score component
-            for idx, word in enumerate(feature_names):
-                if any(keyword.lower() in word.lower() or word.lower() in keyword.lower() 
-                      for keyword in topic_keywords):
-                    score += sentence_vector[idx] * 2  # Higher weight for keyword-related terms
-                else:
-                    score += sentence_vector[idx] * 0.5
-                    
-            sentence_scores.append((i, score, sentence))
-        
-        # Sort sentences by score
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Take top-k sentences
-        top_sentences = [score[2] for score in sentence_scores[:max_sentences]]
+        # Take top-k sentences, highest score first (ties keep their original order)
+        if len(sentences) > max_sentences:
+            top_indices = np.argpartition(-scores, max_sentences - 1)[:max_sentences]
+        else:
+            top_indices = np.arange(len(sentences))
+        top_indices = top_indices[np.lexsort((top_indices, -scores[top_indices]))]
+        top_sentences = [sentences[i] for i in top_indices]
         
         # Log scoring results
         logger.info(f"Ranked {len(sentences)} sentences by relevance to {len(topic_keywords)} keywords")
@@ -232,6 +280,9 @@ def refine_reddit_semantics(text: str, topic_keywords: List[str], max_sentences:
     
     # Tokenize into sentences
     try:
+        import nltk
+        from nltk.tokenize import sent_tokenize
+        
         sentences = sent_tokenize(text)
     except LookupError:
         logger.info("NLTK punkt not found. Downloading...")
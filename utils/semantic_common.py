@@ -0,0 +1,134 @@
+"""
+Helpers shared by the semantic refiners (reddit_semantic_refiner and thread_refiner):
+sentence filters, torch thread configuration and hashed term relevance scoring.
+"""
+
+import os
+import re
+from typing import List, TYPE_CHECKING
+
+import numpy as np
+
+# torch and sklearn are imported inside the functions that use them, so importing the
+# refiners (e.g. just for the sentence filters) stays cheap
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+# Lists for filtering
+NON_INFORMATIVE_REPLIES = [
+    "lol", "same", "this", "haha", "yeah", "yep", "ok", "okay", "thx", "thanks",
+    "ty", "cool", "nice", "wow", "omg", "lmao", "rofl", "true", "false", "agree",
+    "disagree", "upvoted", "downvoted", "saved", "true that", "exactly", "facts",
+    "100%", "absolutely", "definitely", "for sure", "right"
+]
+
+SYMPATHY_ONLY_PHRASES = [
+    "sorry to hear", "my condolences", "rip", "rest in peace", "thoughts and prayers",
+    "sending love", "hugs", "that's terrible", "that's awful", "how sad",
+    "so sad", "feel better", "get well soon", "thinking of you", "praying for you",
+    "sorry for your loss", "sorry about that", "that sucks", "that's rough"
+]
+
+# Compiled matchers for the phrase lists above. A non-informative phrase must be the
+# whole sentence, or its first or last word(s); sympathy phrases may appear anywhere
+# but must match on word boundaries (so "rip" does not match "trip").
+_NON_INFORMATIVE_ALTERNATION = '|'.join(map(re.escape, NON_INFORMATIVE_REPLIES))
+_NON_INFORMATIVE_RE = re.compile(
+    rf'^(?:{_NON_INFORMATIVE_ALTERNATION})(?: |\Z)|(?:^| )(?:{_NON_INFORMATIVE_ALTERNATION})\Z'
+)
+_SYMPATHY_ONLY_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, SYMPATHY_ONLY_PHRASES)) + r')\b')
+
+# Shared vectorizer for relevance ranking (see get_hashing_vectorizer)
+_hashing_vectorizer = None
+
+def is_non_informative(sentence: str) -> bool:
+    """
+    Checks if a sentence is a short, non-informative reply
+
+    Args:
+        sentence: The input sentence
+
+    Returns:
+        True if the sentence is non-informative, False otherwise
+    """
+    clean_text = sentence.strip().lower()
+
+    # Check for very short sentences (less than 4 words and 15 chars)
+    if len(clean_text.split()) < 4 and len(clean_text) < 15:
+        return True
+
+    # Check if sentence consists solely of, starts with, or ends with a non-informative phrase
+    return _NON_INFORMATIVE_RE.search(clean_text) is not None
+
+def is_sympathy_only(sentence: str) -> bool:
+    """
+    Checks if a sentence is only expressing sympathy without substantive content
+
+    Args:
+        sentence: The input sentence
+
+    Returns:
+        True if the sentence only expresses sympathy, False otherwise
+    """
+    clean_text = sentence.strip().lower()
+
+    # Short sentences that contain sympathy phrases are likely sympathy-only
+    return len(clean_text.split()) < 10 and _SYMPATHY_ONLY_RE.search(clean_text) is not None
+
+def configure_torch_threads() -> None:
+    """
+    Tunes torch CPU threading for inference: intra-op parallelism on all but one core
+    and a small inter-op pool.
+    """
+    import torch
+
+    torch.set_num_threads(max(1, (os.cpu_count() or 2) - 1))
+    try:
+        torch.set_num_interop_threads(2)
+    except RuntimeError:
+        pass  # Can only be set once, before any inter-op parallel work has started
+
+def get_hashing_vectorizer() -> "HashingVectorizer":
+    """
+    Returns the shared HashingVectorizer used for relevance ranking, creating it on
+    first use. It is stateless, so one instance serves every call without refitting.
+    """
+    global _hashing_vectorizer
+    if _hashing_vectorizer is None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+        _hashing_vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False, norm='l2',
+                                                stop_words='english')
+    return _hashing_vectorizer
+
+def term_relevance_scores(sentence_texts: List[str], keywords_lower: List[str]) -> np.ndarray:
+    """
+    Scores sentences by their hashed term frequencies, weighting terms related to a keyword
+    (either one containing the other) higher than the rest
+
+    Args:
+        sentence_texts: List of sentence strings
+        keywords_lower: List of lowercase topic keywords
+
+    Returns:
+        Array with the term score of each sentence
+    """
+    vectorizer = get_hashing_vectorizer()
+
+    # Hash all sentences into normalized term-frequency vectors (no vocabulary to fit)
+    term_matrix = vectorizer.transform(sentence_texts)
+
+    # Keyword match computed once per distinct term, then mapped onto hashed features
+    analyzer = vectorizer.build_analyzer()
+    terms = list(set().union(*map(analyzer, sentence_texts)))
+    term_boost = np.fromiter((any(keyword in term or term in keyword for keyword in keywords_lower)
+                              for term in terms), dtype=bool, count=len(terms))
+    feature_boost = np.zeros(vectorizer.n_features, dtype=bool)
+    if term_boost.any():
+        related_terms = [term for term, boost in zip(terms, term_boost) if boost]
+        feature_boost[vectorizer.transform([" ".join(related_terms)]).indices] = True
+
+    # Per-feature weights: higher weight for keyword-related terms
+    feature_weights = np.where(feature_boost, 2.0, 0.5)
+
+    # Term score component for every sentence in one sparse matrix-vector product
+    return term_matrix @ feature_weights
@@ -1,14 +1,25 @@
 import os
 import re
+import json
 import logging
+import threading
 import numpy as np
 import hashlib
-from typing import List, Dict, Tuple, Optional, Any, Union
-import nltk
-from nltk.tokenize import sent_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Tuple, Optional, Any, Union, TYPE_CHECKING
+from utils.embed_cache import get_or_encode
+from utils.semantic_common import (NON_INFORMATIVE_REPLIES, SYMPATHY_ONLY_PHRASES, configure_torch_threads,
+                                   is_non_informative, is_sympathy_only, term_relevance_scores)
+
+# Heavy dependencies are imported on first use (see utils.semantic_common)
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# Optional SIMD-accelerated hash for sentence IDs; hashlib.blake2b is the fallback
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,30 +29,48 @@ logger = logging.getLogger(__name__)
 os.makedirs("logs", exist_ok=True)
 os.makedirs("logs/pipeline", exist_ok=True)
 
+# Above this many sentences, deduplication uses faiss (when installed) for the similarity search
+FAISS_MIN_SENTENCES = 300
+
+# Write the refined output to logs/pipeline on every call (otherwise only at DEBUG level)
+DUMP_PIPELINE = os.environ.get("TOPICMIND_DUMP_PIPELINE", "0") == "1"
+
+# Token pattern for exact keyword matching (unlike the scikit-learn default, keeps 1-char tokens)
+KEYWORD_TOKEN_PATTERN = r"(?u)\b\w+\b"
+_KEYWORD_TOKEN_RE = re.compile(KEYWORD_TOKEN_PATTERN)
+
 # Set up model constants
 DEFAULT_MODEL_NAME = "all-mpnet-base-v2"
 
-# Lists for filtering
-NON_INFORMATIVE_REPLIES = [
-    "lol", "same", "this", "haha", "yeah", "yep", "ok", "okay", "thx", "thanks", 
-    "ty", "cool", "nice", "wow", "omg", "lmao", "rofl", "true", "false", "agree",
-    "disagree", "upvoted", "downvoted", "saved", "true that", "exactly", "facts",
-    "100%", "absolutely", "definitely", "for sure", "right"
-]
+# Inputs shorter than this are split with a regex instead of Punkt, provided the average
+# sentence length stays plausible (otherwise the text falls back to Punkt)
+FAST_SPLIT_MAX_CHARS = 8000
+FAST_SPLIT_MAX_AVG_CHARS = 300
+# Sentence end: terminator (plus closing quotes/brackets) and whitespace, followed by
+# anything but a lowercase word (like Punkt's orthographic heuristic)
+_FAST_SENT_RE = re.compile(r'([.!?]["\')\]\u201d\u2019]*)\s+(?=[^a-z\s])')
+
+# A period after one of these ends an abbreviation, not a sentence: a title ("Dr.", "Mrs."),
+# a single-letter initial other than "I" and "A" ("J."), a dotted initialism ("U.S.", "e.g."),
+# or a list number at the start of a line ("3.")
+_ABBREVIATIONS = ['Mr', 'Mrs', 'Ms', 'Dr', 'St', 'Jr', 'Sr', 'Prof', 'Rev', 'Gen', 'Col', 'Capt',
+                  'Sgt', 'Lt', 'Mt', 'Ft', 'Inc', 'Ltd', 'Corp', 'Co', 'vs']
+_ABBREVIATION_RE = re.compile(
+    r'(?:(?<![^\s(])(?:' + '|'.join(_ABBREVIATIONS) + r'|[B-HJ-Z]|(?:[A-Za-z]\.)+[A-Za-z])'
+    r'|(?<![^\n])\d{1,3})\.$'
+)
 
-SYMPATHY_ONLY_PHRASES = [
-    "sorry to hear", "my condolences", "rip", "rest in peace", "thoughts and prayers",
-    "sending love", "hugs", "that's terrible", "that's awful", "how sad",
-    "so sad", "feel better", "get well soon", "thinking of you", "praying for you",
-    "sorry for your loss", "sorry about that", "that sucks", "that's rough"
-]
+# Shared Punkt sentence tokenizer, loaded on first use
+_punkt_tokenizer = None
 
-# Singleton model instance
+# Singleton model instance, guarded so concurrent callers load it only once
 _model = None
+_model_lock = threading.Lock()
 
-def load_embedding_model(model_name: str = DEFAULT_MODEL_NAME) -> Optional[SentenceTransformer]:
+def load_embedding_model(model_name: str = DEFAULT_MODEL_NAME) -> Optional["SentenceTransformer"]:
     """
-    Loads the sentence transformer model for embeddings.
+    Loads the sentence transformer model for embeddings. Thread-safe: concurrent callers
+    share a single loaded model.
     
     Args:
         model_name: Name of the transformer model to load
@@ -53,57 +82,86 @@ def load_embedding_model(model_name: str = DEFAULT_MODEL_NAME) -> Optional[Sente
     if _model is not None:
         return _model
     
-    try:
-        logging.info(f"Loading sentence transformer model ({model_name}) in CPU-only mode")
-        _model = SentenceTransformer(model_name, device='cpu')
-        logging.info(f"Sentence transformer model loaded successfully")
-        return _model
-    except Exception as e:
-        logging.error(f"Error loading sentence transformer model: {e}")
-        return None
+    with _model_lock:
+        if _model is not None:
+            return _model
+        
+        try:
+            from sentence_transformers import SentenceTransformer
+            
+            logging.info(f"Loading sentence transformer model ({model_name}) in CPU-only mode")
+            _model = SentenceTransformer(model_name, device='cpu')
+            configure_torch_threads()
+            logging.info(f"Sentence transformer model loaded successfully")
+            return _model
+        except Exception as e:
+            logging.error(f"Error loading sentence transformer model: {e}")
+            return None
 
-def is_non_informative(sentence: str) -> bool:
+def warm_up_embedding_model() -> None:
     """
-    Checks if a sentence is a short, non-informative reply
+    Loads the embedding model and runs a tiny encode so the tokenizer and inference kernels
+    are paged in before the first real request.
     
-    Args:
-        sentence: The input sentence
-        
-    Returns:
-        True if the sentence is non-informative, False otherwise
+    Under a pre-forking server (e.g. gunicorn --preload) this runs once in the parent process
+    and workers share the loaded model copy-on-write.
     """
-    clean_text = sentence.strip().lower()
+    model = load_embedding_model()
+    if model is None:
+        return
     
-    # Check for very short sentences (less than 4 words and 15 chars)
-    if len(clean_text.split()) < 4 and len(clean_text) < 15:
-        return True
+    try:
+        model.encode(["warmup"], convert_to_numpy=True)
+    except Exception as e:
+        logging.warning(f"Embedding model warm-up failed: {e}")
+
+def get_sentence_tokenizer():
+    """
+    Returns the shared Punkt sentence tokenizer, loading it (and downloading the punkt data
+    if missing) on first use so later calls skip the pickle load.
+    """
+    global _punkt_tokenizer
+    if _punkt_tokenizer is None:
+        import nltk
         
-    # Check if sentence consists solely of a non-informative phrase
-    for phrase in NON_INFORMATIVE_REPLIES:
-        if clean_text == phrase or clean_text.startswith(phrase + " ") or clean_text.endswith(" " + phrase):
-            return True
-    
-    return False
+        try:
+            _punkt_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+        except LookupError:
+            logger.info("NLTK punkt not found. Downloading...")
+            nltk.download('punkt', quiet=True)
+            _punkt_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+    return _punkt_tokenizer
+
+def _fast_split_sentences(text: str) -> List[str]:
+    """Splits text after . ! or ? unless a lowercase word follows, skipping abbreviations."""
+    sentences = []
+    start = 0
+    for match in _FAST_SENT_RE.finditer(text):
+        end = match.end(1)
+        if match.group(1) == '.' and _ABBREVIATION_RE.search(text, start, end):
+            continue
+        sentences.append(text[start:end])
+        start = match.end()
+    sentences.append(text[start:])
+    return sentences
 
-def is_sympathy_only(sentence: str) -> bool:
+def split_sentences(text: str) -> List[str]:
     """
-    Checks if a sentence is only expressing sympathy without substantive content
+    Splits text into sentences, using a regex splitter for short inputs and Punkt otherwise
     
     Args:
-        sentence: The input sentence
+        text: The text to split
         
     Returns:
-        True if the sentence only expresses sympathy, False otherwise
+        List of sentences
     """
-    clean_text = sentence.strip().lower()
-    
-    # Short sentences that contain sympathy phrases are likely sympathy-only
-    if len(clean_text.split()) < 10:
-        for phrase in SYMPATHY_ONLY_PHRASES:
-            if phrase in clean_text:
-                return True
+    if len(text) < FAST_SPLIT_MAX_CHARS:
+        sentences = _fast_split_sentences(text.strip())
+        # Few sentence boundaries for the length means unusual punctuation; let Punkt decide
+        if len(text) / len(sentences) <= FAST_SPLIT_MAX_AVG_CHARS:
+            return sentences
     
-    return False
+    return get_sentence_tokenizer().tokenize(text)
 
 def generate_sentence_hash(text: str) -> str:
     """
@@ -115,7 +173,10 @@ def generate_sentence_hash(text: str) -> str:
     Returns:
         A short hash string to uniquely identify the sentence
     """
-    return hashlib.md5(text.encode('utf-8')).hexdigest()[:8]
+    data = text.encode('utf-8')
+    if BLAKE3_AVAILABLE:
+        return blake3(data).hexdigest(length=4)
+    return hashlib.blake2b(data, digest_size=4).hexdigest()
 
 def deduplicate_sentences(sentences: List[Dict[str, Any]], threshold: float = 0.85, model=None) -> List[Dict[str, Any]]:
     """
@@ -131,6 +192,17 @@ def deduplicate_sentences(sentences: List[Dict[str, Any]], threshold: float = 0.
     """
     if not sentences:
         return []
+    
+    # Drop byte-identical sentences before paying for any embeddings (first occurrence wins)
+    seen_texts = set()
+    unique_sentences = []
+    for s in sentences:
+        if s['text'] not in seen_texts:
+            seen_texts.add(s['text'])
+            unique_sentences.append(s)
+    if len(unique_sentences) < len(sentences):
+        logger.info(f"Removed {len(sentences) - len(unique_sentences)} exact duplicate sentences")
+        sentences = unique_sentences
         
     # Extract just the text for embedding
     sentence_texts = [s['text'] for s in sentences]
@@ -143,20 +215,40 @@ def deduplicate_sentences(sentences: List[Dict[str, Any]], threshold: float = 0.
         logger.error("Embedding model failed to load. Skipping deduplication.")
         return sentences
     
-    # Get embeddings for all sentences
+    # Get embeddings for all sentences, encoding only those not already cached
     try:
-        embeddings = model.encode(sentence_texts, convert_to_tensor=True)
-        embeddings = embeddings.cpu().numpy()  # Convert to numpy for similarity calculation
+        embeddings = get_or_encode(sentence_texts, model)
         
-        # Calculate pairwise similarity
-        similarity_matrix = cosine_similarity(embeddings)
+        # Embeddings are stored as float16; widen once so the dot products run on BLAS
+        # with float32 accumulation (numpy has no BLAS kernel for float16)
+        embeddings = embeddings.astype(np.float32)
         
-        # Track indices to keep
+        # Greedily keep each sentence that is not similar to any previously kept one.
+        # Embeddings are L2-normalized, so a dot product is the cosine similarity, and
+        # comparing against the kept rows avoids building the full N x N matrix.
         indices_to_keep = []
-        for i in range(len(sentences)):
-            # If this sentence is not similar to any previously kept sentence, keep it
-            if not any(similarity_matrix[i, j] > threshold for j in indices_to_keep):
-                indices_to_keep.append(i)
+        faiss = None
+        if len(sentences) > FAISS_MIN_SENTENCES:
+            # Optional SIMD inner-product search, imported only when a thread is long enough
+            try:
+                import faiss
+            except ImportError:
+                pass
+        if faiss is not None:
+            # Long threads: let faiss run the inner-product search over the kept rows
+            index = faiss.IndexFlatIP(embeddings.shape[1])
+            for i, embedding in enumerate(embeddings):
+                query = embedding[np.newaxis]
+                if index.ntotal == 0 or index.search(query, 1)[0][0, 0] <= threshold:
+                    index.add(query)
+                    indices_to_keep.append(i)
+        else:
+            kept_embeddings = np.empty_like(embeddings)
+            for i, embedding in enumerate(embeddings):
+                kept_count = len(indices_to_keep)
+                if kept_count == 0 or (kept_embeddings[:kept_count] @ embedding).max() <= threshold:
+                    kept_embeddings[kept_count] = embedding
+                    indices_to_keep.append(i)
                 
         # Return deduplicated sentences
         logger.info(f"Deduplicated from {len(sentences)} to {len(indices_to_keep)} sentences")
@@ -166,9 +258,33 @@ def deduplicate_sentences(sentences: List[Dict[str, Any]], threshold: float = 0.
         logger.error(f"Error during sentence deduplication: {e}")
         return sentences
 
+def count_keyword_hits(sentence_texts: List[str], keywords: List[str]) -> np.ndarray:
+    """
+    Counts how many of the keywords occur as whole words (or word sequences) in each sentence
+    
+    Args:
+        sentence_texts: List of sentence strings
+        keywords: List of keywords or multi-word keyphrases
+        
+    Returns:
+        Array with the number of distinct keywords found in each sentence
+    """
+    # Normalize keywords with the same tokenizer used on the sentences
+    phrases = (" ".join(_KEYWORD_TOKEN_RE.findall(keyword.lower())) for keyword in keywords)
+    vocabulary = list(dict.fromkeys(phrase for phrase in phrases if phrase))
+    if not vocabulary:
+        return np.zeros(len(sentence_texts))
+    
+    from sklearn.feature_extraction.text import CountVectorizer
+    
+    max_ngram = max(phrase.count(" ") + 1 for phrase in vocabulary)
+    counter = CountVectorizer(vocabulary=vocabulary, lowercase=True, token_pattern=KEYWORD_TOKEN_PATTERN,
+                              ngram_range=(1, max_ngram), binary=True)
+    return np.asarray(counter.transform(sentence_texts).sum(axis=1)).ravel()
+
 def rank_by_relevance(sentences: List[Dict[str, Any]], topic_keywords: List[str], max_sentences: int = 15) -> List[Dict[str, Any]]:
     """
-    Ranks sentences by relevance to topic keywords using TF-IDF
+    Ranks sentences by relevance to topic keywords using hashed term frequencies
     
     Args:
         sentences: List of sentence dictionaries to rank
@@ -181,58 +297,28 @@ def rank_by_relevance(sentences: List[Dict[str, Any]], topic_keywords: List[str]
     if not sentences or not topic_keywords:
         return sentences[:max_sentences] if sentences else []
     
-    # Extract just the text for TF-IDF
+    # Extract just the text for scoring
     sentence_texts = [s['text'] for s in sentences]
     
     try:
-        # Create a TF-IDF vectorizer
-        tfidf = TfidfVectorizer(stop_words='english')
-        
-        # Fit TF-IDF on all sentences
-        tfidf_matrix = tfidf.fit_transform(sentence_texts)
+        # Hashed term-frequency score, weighted towards keyword-related terms
+        keywords_lower = [keyword.lower() for keyword in topic_keywords]
+        scores = term_relevance_scores(sentence_texts, keywords_lower)
         
-        # Create a keyword importance vector
-        keywords_str = " ".join(topic_keywords)
-        keywords_tfidf = tfidf.transform([keywords_str])
+        # Boost score for sentences containing exact keywords
+        scores = scores + 3 * count_keyword_hits(sentence_texts, keywords_lower)
         
-        # Get feature names
-        feature_names = tfidf.get_feature_names_out()
-        
-        # Calculate sentence scores based on keywords
-        sentence_scores = []
-        
-        for i, sentence_dict in enumerate(sentences):
-            sentence = sentence_dict['text']
-            # Get sentence vector
-            sentence_vector = tfidf_matrix[i].toarray().flatten()
-            
-            # Calculate weighted score based on keyword importance
-            score = 0
-            
-            # Boost score for sentences containing exact keywords
-            for keyword in topic_keywords:
-                if keyword.lower() in sentence.lower():
-                    score += 3
-            
-            # Add TF-IDF score component
-            for idx, word in enumerate(feature_names):
-                if any(keyword.lower() in word.lower() or word.lower() in keyword.lower() 
-                      for keyword in topic_keywords):
-                    score += sentence_vector[idx] * 2  # Higher weight for keyword-related terms
-                else:
-                    score += sentence_vector[idx] * 0.5
-                    
-            sentence_scores.append((i, score, sentence_dict))
-        
-        # Sort sentences by score
-        sentence_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Take top-k sentences
-        top_sentences = [score[2] for score in sentence_scores[:max_sentences]]
+        # Take top-k sentences, highest score first (ties keep their original order)
+        if len(sentences) > max_sentences:
+            top_indices = np.argpartition(-scores, max_sentences - 1)[:max_sentences]
+        else:
+            top_indices = np.arange(len(sentences))
+        top_indices = top_indices[np.lexsort((top_indices, -scores[top_indices]))]
+        top_sentences = [sentences[i] for i in top_indices]
         
         # Add the relevance score to each sentence dictionary
-        for i, (_, score, _) in enumerate(sentence_scores[:max_sentences]):
-            top_sentences[i]['relevance_score'] = float(score)
+        for i, sentence_dict in zip(top_indices, top_sentences):
+            sentence_dict['relevance_score'] = float(scores[i])
         
         # Log scoring results
         logger.info(f"Ranked {len(sentences)} sentences by relevance to {len(topic_keywords)} keywords")
@@ -245,7 +331,7 @@ def rank_by_relevance(sentences: List[Dict[str, Any]], topic_keywords: List[str]
         return sentences[:max_sentences] if sentences else []
 
 def refine_thread_content(text: str, topic_keywords: List[str], max_sentences: int = 15, 
-                        model: Optional[SentenceTransformer] = None) -> List[Dict[str, Any]]:
+                        model: Optional["SentenceTransformer"] = None) -> List[Dict[str, Any]]:
     """
     Refines thread content by removing non-informative sentences, deduplicating similar content,
     and ranking by relevance to the topic keywords.
@@ -265,11 +351,7 @@ def refine_thread_content(text: str, topic_keywords: List[str], max_sentences: i
     
     # Tokenize into sentences
     try:
-        raw_sentences = sent_tokenize(text)
-    except LookupError:
-        logger.info("NLTK punkt not found. Downloading...")
-        nltk.download('punkt')
-        raw_sentences = sent_tokenize(text)
+        raw_sentences = split_sentences(text)
     except Exception as e:
         logger.error(f"Error tokenizing sentences: {e}")
         return []
@@ -288,13 +370,11 @@ def refine_thread_content(text: str, topic_keywords: List[str], max_sentences: i
                 'hash': sent_hash
             })
     
-    # Filter out non-informative replies
-    sentences = [s for s in sentences if not is_non_informative(s['text'])]
-    logger.info(f"Removed short non-informative replies. {len(sentences)} sentences remaining")
-    
-    # Filter out sympathy-only comments
-    sentences = [s for s in sentences if not is_sympathy_only(s['text'])]
-    logger.info(f"Removed sympathy-only comments. {len(sentences)} sentences remaining")
+    # Filter out non-informative replies and sympathy-only comments in a single pass
+    before = len(sentences)
+    sentences = [s for s in sentences if not (is_non_informative(s['text']) or is_sympathy_only(s['text']))]
+    removed = before - len(sentences)
+    logger.info(f"Removed {removed} non-informative or sympathy-only sentences. {len(sentences)} sentences remaining")
     
     # Deduplicate semantically similar sentences
     sentences = deduplicate_sentences(sentences, model=model)
@@ -302,14 +382,15 @@ def refine_thread_content(text: str, topic_keywords: List[str], max_sentences: i
     # Rank by relevance to topic keywords
     top_sentences = rank_by_relevance(sentences, topic_keywords, max_sentences)
     
-    # Log the final result (text only, for simpler viewing)
-    with open("logs/pipeline/semantic_cleaned_output.txt", "w") as f:
-        f.write("\n\n".join([s['text'] for s in top_sentences]))
-    
-    # Log the full data with provenance
-    with open("logs/pipeline/semantic_cleaned_with_provenance.json", "w") as f:
-        import json
-        json.dump(top_sentences, f, indent=2)
+    # Dump the result for inspection only when debugging, keeping file I/O off the request path
+    if DUMP_PIPELINE or logger.isEnabledFor(logging.DEBUG):
+        # Log the final result (text only, for simpler viewing)
+        with open("logs/pipeline/semantic_cleaned_output.txt", "w") as f:
+            f.write("\n\n".join([s['text'] for s in top_sentences]))
+        
+        # Log the full data with provenance
+        with open("logs/pipeline/semantic_cleaned_with_provenance.json", "w") as f:
+            json.dump(top_sentences, f, indent=2)
     
     return top_sentences
 
@@ -334,7 +415,7 @@ def chunk_sentences(sentences: List[Dict[str, Any]], chunk_size: int = 10) -> Li
 
 # For backward compatibility with reddit_semantic_refiner
 def refine_reddit_semantics(text: str, topic_keywords: List[str], max_sentences: int = 15,
-                          model: Optional[SentenceTransformer] = None) -> List[Dict[str, Any]]:
+                          model: Optional["SentenceTransformer"] = None) -> List[Dict[str, Any]]:
     """
     Wrapper for refine_thread_content for Reddit content, maintained for backward compatibility.
     
@@ -391,4 +472,9 @@ def process_reddit_text(raw_text: str, topic_keywords: List[str], max_sentences:
     Returns:
         List of processed and prioritized sentence dictionaries
     """
-    return process_thread_text(raw_text, topic_keywords, max_sentences, is_reddit=True) 
\ No newline at end of file
+    return process_thread_text(raw_text, topic_keywords, max_sentences, is_reddit=True) 
+
+# Opt-in: load the embedding model at import so the first request does not pay for it.
+# Off by default so scripts and tests importing this module stay free of torch and the model.
+if os.environ.get("TOPICMIND_EAGER_MODEL", "0") == "1":
+    warm_up_embedding_model()
@@ -1,9 +1,20 @@
 import os
+import json
+import asyncio
 import logging
-from typing import Union, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Union, List, Optional, Tuple
 import openai
 from dotenv import load_dotenv
 
+# Optional persistent cache for refined topic names
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -26,8 +37,25 @@ except Exception as e:
     logging.error(f"Failed to initialize OpenAI client: {str(e)}")
     logging.error("Please ensure your OPENAI_API_KEY environment variable is set correctly.")
 
+# Upper bound on concurrent requests made by refine_many
+MAX_CONCURRENT_REQUESTS = 10
+
+# The API key is not verified at startup (that would cost a network round-trip on every
+# import); the first real request verifies it, and a rejected key disables further calls.
+_api_key_rejected = False
+
+def _reject_api_key() -> None:
+    """Stops further OpenAI calls after the API rejected the configured key."""
+    global _api_key_rejected
+    _api_key_rejected = True
+    logging.error("OpenAI rejected the API key. Using fallback topic names from now on.")
+
 PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompts')
 DEFAULT_PROMPT_PATH = os.path.join(PROMPT_DIR, 'refine_topic.gpt.txt')
+BATCH_PROMPT_PATH = os.path.join(PROMPT_DIR, 'refine_topics_batch.gpt.txt')
+
+# Translation table that deletes double quotes from model responses
+_QUOTE_DEL = str.maketrans('', '', '"')
 
 def load_prompt_template(prompt_path: str = DEFAULT_PROMPT_PATH) -> Optional[str]:
     """Loads the prompt template from the specified file."""
@@ -41,6 +69,113 @@ def load_prompt_template(prompt_path: str = DEFAULT_PROMPT_PATH) -> Optional[str
         logging.error(f"Error loading prompt template: {e}")
         return None
 
+# Load the default templates once rather than re-reading them on every call
+_DEFAULT_PROMPT = load_prompt_template()
+_BATCH_PROMPT = load_prompt_template(BATCH_PROMPT_PATH)
+
+# Directory holding refined topic names across restarts (when diskcache is installed)
+TOPIC_CACHE_DIR = "logs/topic_cache"
+_topic_cache = None
+
+# In-memory cache of refined topic names by topic_cache_key, least recently used evicted first
+TOPIC_MEMORY_CACHE_SIZE = 1024
+_topic_names: "OrderedDict[Tuple[str, Tuple[str, ...]], str]" = OrderedDict()
+_topic_names_lock = threading.Lock()
+
+def get_topic_cache():
+    """Returns the on-disk topic name cache, opening it on first use, or None if unavailable."""
+    global _topic_cache
+    if _topic_cache is None and DISKCACHE_AVAILABLE:
+        try:
+            _topic_cache = diskcache.Cache(TOPIC_CACHE_DIR)
+        except Exception as e:
+            logging.warning(f"Could not open topic name cache at {TOPIC_CACHE_DIR}: {e}")
+    return _topic_cache
+
+def clean_topic_name(refined_name: str) -> str:
+    """Basic cleaning of a model-generated topic name (remove quotes, ensure reasonable length)."""
+    refined_name = refined_name.translate(_QUOTE_DEL).strip().removeprefix("Topic Name:").strip()
+    if len(refined_name.split()) > 5:  # Heuristic check for overly long names
+        logging.warning(f"Refined topic name seems long: '{refined_name}'. Using first few words.")
+        refined_name = " ".join(refined_name.split()[:3])  # Limit to ~3 words
+    return refined_name
+
+def _topic_request(keywords: List[str], model: str, prompt_template: str) -> dict:
+    """Builds the chat completion arguments for naming a single topic."""
+    # Format the prompt
+    keyword_string = ", ".join(keywords)
+    prompt = prompt_template.format(keywords=keyword_string)
+    
+    logging.info(f"Refining topic with keywords: {keyword_string}")
+
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are an expert in summarizing topics concisely."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=15,  # Keep response short
+        temperature=0.2,  # Lower temperature for more deterministic output
+        n=1
+    )
+
+def _topic_from_response(response) -> str:
+    """Extracts and cleans the topic name from a chat completion response."""
+    refined_name = response.choices[0].message.content.strip()
+    logging.info(f"OpenAI refined name: {refined_name}")
+
+    return clean_topic_name(refined_name)
+
+def _request_topic_name(keywords: List[str], model: str, prompt_template: str) -> str:
+    """
+    Calls the OpenAI API for a topic name and cleans the response.
+
+    Returns:
+        The cleaned topic name (possibly empty). Raises on API errors.
+    """
+    response = client.chat.completions.create(**_topic_request(keywords, model, prompt_template))
+    return _topic_from_response(response)
+
+def topic_cache_key(keywords: List[str], model: str) -> Tuple[str, Tuple[str, ...]]:
+    """Cache key for a topic: the model plus the sorted, lowercased keyword set."""
+    return (model, tuple(sorted(keyword.lower() for keyword in keywords)))
+
+def get_cached_topic_name(cache_key: Tuple[str, Tuple[str, ...]]) -> Optional[str]:
+    """
+    Looks up a topic name refined earlier with the default prompt, first in memory and
+    then in the on-disk cache.
+
+    Returns:
+        The cached topic name, or None on a miss
+    """
+    with _topic_names_lock:
+        if cache_key in _topic_names:
+            _topic_names.move_to_end(cache_key)
+            return _topic_names[cache_key]
+
+    disk_cache = get_topic_cache()
+    if disk_cache is not None:
+        cached_name = disk_cache.get(cache_key)
+        if cached_name is not None:
+            _remember_topic_name(cache_key, cached_name)
+            return cached_name
+    return None
+
+def _remember_topic_name(cache_key: Tuple[str, Tuple[str, ...]], refined_name: str) -> None:
+    """Stores a topic name in the in-memory cache, evicting the least recently used entries."""
+    with _topic_names_lock:
+        _topic_names[cache_key] = refined_name
+        _topic_names.move_to_end(cache_key)
+        while len(_topic_names) > TOPIC_MEMORY_CACHE_SIZE:
+            _topic_names.popitem(last=False)
+
+def cache_topic_name(cache_key: Tuple[str, Tuple[str, ...]], refined_name: str) -> None:
+    """Stores a topic name refined with the default prompt in memory and on disk."""
+    _remember_topic_name(cache_key, refined_name)
+    disk_cache = get_topic_cache()
+    if disk_cache is not None:
+        disk_cache.set(cache_key, refined_name)
+
 def refine_topic_name(keywords: List[str], model: str = "gpt-3.5-turbo", prompt_template: Optional[str] = None) -> str:
     """
     Uses OpenAI's GPT model to generate a refined topic name from a list of keywords.
@@ -48,7 +183,7 @@ def refine_topic_name(keywords: List[str], model: str = "gpt-3.5-turbo", prompt_
     Args:
         keywords: A list of keywords representing a topic.
         model: The OpenAI model to use (e.g., "gpt-3.5-turbo" is more widely available than "gpt-4-turbo-preview").
-        prompt_template: The template string for the prompt. If None, loads default.
+        prompt_template: The template string for the prompt. If None, uses the default template.
 
     Returns:
         A refined topic name string, or a default name like "Topic [keywords]" on failure.
@@ -57,21 +192,80 @@ def refine_topic_name(keywords: List[str], model: str = "gpt-3.5-turbo", prompt_
         logging.warning("OpenAI client not initialized. Cannot refine topic name.")
         return f"Topic [{', '.join(keywords[:3])}...]"  # Fallback name
 
+    if _api_key_rejected:
+        return f"Topic [{', '.join(keywords[:3])}...]"  # Fallback name, already logged once
+
     if not keywords:
         return "Unknown Topic"
 
-    if prompt_template is None:
-        prompt_template = load_prompt_template()
+    if prompt_template is None and _DEFAULT_PROMPT is None:
+        # Fallback if template loading fails
+        logging.warning("Could not load prompt template. Using fallback topic name.")
+        return f"Topic [{', '.join(keywords[:3])}...]"
+
+    try:
         if prompt_template is None:
-            # Fallback if template loading fails
-            logging.warning("Could not load prompt template. Using fallback topic name.")
-            return f"Topic [{', '.join(keywords[:3])}...]"
+            # Reuse earlier answers for the same keyword set; the request itself keeps the
+            # caller's keyword order and casing
+            cache_key = topic_cache_key(keywords, model)
+            refined_name = get_cached_topic_name(cache_key)
+            if refined_name is None:
+                refined_name = _request_topic_name(keywords, model, _DEFAULT_PROMPT)
+                cache_topic_name(cache_key, refined_name)
+        else:
+            refined_name = _request_topic_name(keywords, model, prompt_template)
 
-    # Format the prompt
-    keyword_string = ", ".join(keywords)
-    prompt = prompt_template.format(keywords=keyword_string)
-    
-    logging.info(f"Refining topic with keywords: {keyword_string}")
+        return refined_name if refined_name else f"Topic [{', '.join(keywords[:3])}...]"  # Fallback if empty response
+
+    except Exception as e:
+        logging.error(f"Error calling OpenAI API for topic refinement: {e}")
+        if isinstance(e, openai.AuthenticationError):
+            _reject_api_key()
+        # Fallback to a default name
+        return f"Topic [{', '.join(keywords[:3])}...]"
+
+def refine_topic_names(keyword_lists: List[List[str]], model: str = "gpt-3.5-turbo") -> List[str]:
+    """
+    Generates refined topic names for several topics with a single OpenAI request.
+
+    Args:
+        keyword_lists: One list of keywords per topic.
+        model: The OpenAI model to use (must support JSON response format).
+
+    Returns:
+        One topic name per keyword list, in the same order. Keyword sets already in the topic
+        name cache are not requested again; falls back to refining each remaining topic
+        separately if the batched request fails.
+    """
+    if client is None or _api_key_rejected or _DEFAULT_PROMPT is None:
+        return [refine_topic_name(keywords, model) for keywords in keyword_lists]
+
+    # Serve keyword sets named earlier from the cache and request only the rest
+    refined_names: List[Optional[str]] = [None] * len(keyword_lists)
+    misses = []
+    for i, keywords in enumerate(keyword_lists):
+        if not keywords:
+            refined_names[i] = "Unknown Topic"
+            continue
+        refined_names[i] = get_cached_topic_name(topic_cache_key(keywords, model))
+        if refined_names[i] is None:
+            misses.append(i)
+        elif not refined_names[i]:
+            refined_names[i] = f"Topic [{', '.join(keywords[:3])}...]"  # Cached empty response
+
+    if len(misses) <= 1 or _BATCH_PROMPT is None:
+        for i in misses:
+            refined_names[i] = refine_topic_name(keyword_lists[i], model)
+        return refined_names
+
+    miss_lists = [keyword_lists[i] for i in misses]
+
+    # Format the prompt with one numbered line per topic
+    topics_string = "\n".join(f"{n}. {', '.join(keywords)}" for n, keywords in enumerate(miss_lists, 1))
+    prompt = _BATCH_PROMPT.format(count=len(miss_lists), topics=topics_string)
+
+    logging.info(f"Refining {len(miss_lists)} topics in one request "
+                 f"({len(keyword_lists) - len(miss_lists)} from cache)")
 
     try:
         # Call OpenAI API
@@ -81,28 +275,146 @@ def refine_topic_name(keywords: List[str], model: str = "gpt-3.5-turbo", prompt_
                 {"role": "system", "content": "You are an expert in summarizing topics concisely."},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=15,  # Keep response short
+            max_tokens=15 * len(miss_lists) + 20,  # Short names plus JSON overhead
             temperature=0.2,  # Lower temperature for more deterministic output
+            response_format={"type": "json_object"},
             n=1
         )
 
-        # Extract the refined name
-        refined_name = response.choices[0].message.content.strip()
-        logging.info(f"OpenAI refined name: {refined_name}")
+        names = json.loads(response.choices[0].message.content)["names"]
+        if not isinstance(names, list) or len(names) != len(miss_lists):
+            raise ValueError(f"expected {len(miss_lists)} names, got {names!r}")
+
+        for i, keywords, name in zip(misses, miss_lists, names):
+            refined_name = clean_topic_name(str(name))
+            cache_topic_name(topic_cache_key(keywords, model), refined_name)
+            refined_names[i] = refined_name if refined_name else f"Topic [{', '.join(keywords[:3])}...]"
+        logging.info(f"OpenAI refined names: {[refined_names[i] for i in misses]}")
+        return refined_names
+
+    except Exception as e:
+        logging.warning(f"Batched topic refinement failed ({e}). Refining topics one at a time.")
+        if isinstance(e, openai.AuthenticationError):
+            _reject_api_key()
+        for i in misses:
+            refined_names[i] = refine_topic_name(keyword_lists[i], model)
+        return refined_names
+
+def create_async_client():
+    """
+    Creates an AsyncOpenAI client for concurrent requests.
 
-        # Basic cleaning (remove quotes, ensure reasonable length)
-        refined_name = refined_name.replace('"', '').replace("Topic Name:", "").strip()
-        if len(refined_name.split()) > 5:  # Heuristic check for overly long names
-            logging.warning(f"Refined topic name seems long: '{refined_name}'. Using first few words.")
-            refined_name = " ".join(refined_name.split()[:3])  # Limit to ~3 words
+    The client's connection pool is bound to the event loop it first runs on, so a new client
+    is created for each event loop (each refine_many call) instead of sharing one globally.
+
+    Returns:
+        An AsyncOpenAI client, or None if unavailable.
+    """
+    if client is None:
+        return None
+    try:
+        return openai.AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+    except Exception as e:
+        logging.error(f"Failed to initialize async OpenAI client: {e}")
+        return None
+
+async def refine_topic_name_async(keywords: List[str], model: str = "gpt-3.5-turbo",
+                                  prompt_template: Optional[str] = None, async_client=None) -> str:
+    """
+    Async version of refine_topic_name, for naming many topics concurrently.
+
+    Args:
+        keywords: A list of keywords representing a topic.
+        model: The OpenAI model to use.
+        prompt_template: The template string for the prompt. If None, uses the default template.
+        async_client: AsyncOpenAI client created in the running event loop. If None, a client
+            is created for this call only.
+
+    Returns:
+        A refined topic name string, or a default name like "Topic [keywords]" on failure.
+    """
+    if client is None or _api_key_rejected or not keywords:
+        return refine_topic_name(keywords, model, prompt_template)  # Handles the fallbacks
+
+    template = prompt_template if prompt_template is not None else _DEFAULT_PROMPT
+    if template is None:
+        return refine_topic_name(keywords, model, prompt_template)
+
+    if async_client is None:
+        own_client = create_async_client()
+        if own_client is None:
+            return refine_topic_name(keywords, model, prompt_template)
+        try:
+            return await refine_topic_name_async(keywords, model, prompt_template, own_client)
+        finally:
+            await own_client.close()
+
+    # Same topic name cache as the sync path (for the default prompt)
+    cache_key = topic_cache_key(keywords, model) if prompt_template is None else None
+    if cache_key is not None:
+        cached_name = get_cached_topic_name(cache_key)
+        if cached_name is not None:
+            return cached_name or f"Topic [{', '.join(keywords[:3])}...]"
+
+    try:
+        response = await async_client.chat.completions.create(**_topic_request(keywords, model, template))
+        refined_name = _topic_from_response(response)
+        if cache_key is not None:
+            cache_topic_name(cache_key, refined_name)
 
         return refined_name if refined_name else f"Topic [{', '.join(keywords[:3])}...]"  # Fallback if empty response
 
     except Exception as e:
         logging.error(f"Error calling OpenAI API for topic refinement: {e}")
+        if isinstance(e, openai.AuthenticationError):
+            _reject_api_key()
         # Fallback to a default name
         return f"Topic [{', '.join(keywords[:3])}...]"
 
+async def _refine_many_async(keyword_lists: List[List[str]], model: str, max_concurrency: int) -> List[str]:
+    """Runs refine_topic_name_async for every keyword list, at most max_concurrency at a time."""
+    async_client = create_async_client()
+    if async_client is None:
+        return [refine_topic_name(keywords, model) for keywords in keyword_lists]
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(keywords: List[str]) -> str:
+        async with semaphore:
+            return await refine_topic_name_async(keywords, model, async_client=async_client)
+
+    # The client lives only as long as this event loop
+    try:
+        return list(await asyncio.gather(*[bounded(keywords) for keywords in keyword_lists]))
+    finally:
+        await async_client.close()
+
+def refine_many(keyword_lists: List[List[str]], model: str = "gpt-3.5-turbo",
+                max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[str]:
+    """
+    Refines several topic names with concurrent OpenAI requests.
+
+    Args:
+        keyword_lists: One list of keywords per topic.
+        model: The OpenAI model to use.
+        max_concurrency: Maximum number of requests in flight at once.
+
+    Returns:
+        One topic name per keyword list, in the same order. Falls back to sequential
+        refine_topic_name calls when called from a running event loop (use
+        refine_topic_name_async there) or when the async client is unavailable.
+    """
+    try:
+        asyncio.get_running_loop()
+        in_event_loop = True
+    except RuntimeError:
+        in_event_loop = False
+
+    if in_event_loop or client is None:
+        return [refine_topic_name(keywords, model) for keywords in keyword_lists]
+
+    return asyncio.run(_refine_many_async(keyword_lists, model, max_concurrency))
+
 # For testing - uncomment and run this file directly to test
 if __name__ == "__main__":
     # Set these keywords based on expected BERTopic output